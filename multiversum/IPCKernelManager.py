@@ -3,6 +3,7 @@ import uuid
 
 from jupyter_client.manager import AsyncKernelManager
 from jupyter_core.paths import jupyter_runtime_dir
+from jupyter_core.utils import run_sync
 
 
 class IPCKernelManager(AsyncKernelManager):
@@ -19,3 +20,43 @@ class IPCKernelManager(AsyncKernelManager):
             connection_file=connection_file,
             **kwargs,
         )
+
+
+class ReusableIPCKernelManager(IPCKernelManager):
+    """
+    An IPCKernelManager for a kernel that is reused to execute multiple
+    notebooks, one after another.
+
+    Papermill / nbclient neither start nor shut down kernels of a manager that
+    is passed in, but they also don't stop the kernel clients they create.
+    Clients are therefore tracked here, so they can be stopped after each
+    notebook.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._clients = []
+
+    def client(self, **kwargs):
+        kernel_client = super().client(**kwargs)
+        self._clients.append(kernel_client)
+        return kernel_client
+
+    def stop_clients(self) -> None:
+        """Stop the channels of all clients created for this kernel."""
+        while self._clients:
+            self._clients.pop().stop_channels()
+
+    def start_blocking(self) -> None:
+        """Start the kernel and wait for it to be started."""
+        run_sync(self.start_kernel)()
+
+    def restart_blocking(self) -> None:
+        """Restart the kernel immediately, e.g. when it is still busy."""
+        self.stop_clients()
+        run_sync(self.restart_kernel)(now=True)
+
+    def shutdown_blocking(self) -> None:
+        """Stop all clients and shut down the kernel immediately."""
+        self.stop_clients()
+        run_sync(self.shutdown_kernel)(now=True)
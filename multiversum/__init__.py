@@ -1,4 +1,13 @@
-from .multiverse import generate_multiverse_grid, MultiverseAnalysis
+from .multiverse import (
+    generate_multiverse_grid,
+    generate_minimal_grid,
+    MultiverseAnalysis,
+)
 from .universe import Universe
 
-__all__ = ["generate_multiverse_grid", "MultiverseAnalysis", "Universe"]
+__all__ = [
+    "generate_multiverse_grid",
+    "generate_minimal_grid",
+    "MultiverseAnalysis",
+    "Universe",
+]
@@ -3,7 +3,12 @@ from pathlib import Path
 import runpy
 from typing import Optional
 
-from .multiverse import DEFAULT_SEED, MultiverseAnalysis
+from .multiverse import (
+    DEFAULT_BACKEND,
+    DEFAULT_SEED,
+    MultiverseAnalysis,
+    generate_minimal_grid,
+)
 from .logger import logger
 
 DEFAULT_CONFIG_FILE = "multiverse.toml"
@@ -37,7 +42,8 @@ def run_cli(dimensions: Optional[dict] = None, **kwargs) -> None:
             "How to run the multiverse analysis. "
             "(continue: continue from previous run, "
             "full: run all universes, "
-            "test: run only a small subset of universes)"
+            "test: run only a small subset of universes, "
+            "covering each option at least once)"
         ),
         choices=["full", "continue", "test"],
         default="full",
@@ -79,6 +85,48 @@ def run_cli(dimensions: Optional[dict] = None, **kwargs) -> None:
         default=str(DEFAULT_SEED),
         type=int,
     )
+
+    parser.add_argument(
+        "--n-jobs",
+        help=(
+            "The number of universes to run in parallel. "
+            "Negative numbers are relative to the number of CPUs "
+            "(e.g. -2 for all CPUs but one). Defaults to -2."
+        ),
+        default=-2,
+        type=int,
+    )
+
+    parser.add_argument(
+        "--backend",
+        help=(
+            "The joblib backend to use when running universes in parallel. "
+            "Defaults to threading, as notebooks are executed in separate "
+            "kernel processes anyway."
+        ),
+        choices=["loky", "threading", "multiprocessing"],
+        default=DEFAULT_BACKEND,
+    )
+
+    parser.add_argument(
+        "--reuse-kernels",
+        help=(
+            "Reuse kernels across universes instead of starting a new kernel "
+            "for every universe. Faster, but universes are no longer isolated "
+            "from each other."
+        ),
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--output-format",
+        help=(
+            "The file format for the aggregated data. "
+            "Saving as parquet requires pyarrow to be installed. Defaults to csv."
+        ),
+        choices=["csv", "parquet"],
+        default="csv",
+    )
     args = parser.parse_args()
     logger.debug(f"Parsed arguments: {args}")
 
@@ -107,6 +155,7 @@ def run_cli(dimensions: Optional[dict] = None, **kwargs) -> None:
         output_dir=Path(args.output_dir),
         new_run=(args.mode != "continue"),
         seed=args.seed,
+        reuse_kernels=args.reuse_kernels,
         **kwargs,
     )
 
@@ -117,14 +166,14 @@ def run_cli(dimensions: Optional[dict] = None, **kwargs) -> None:
         f"~ Starting Run No. {multiverse_analysis.run_no} (Seed: {multiverse_analysis.seed}) ~"
     )
 
-    # Run the analysis for the first universe
     if args.mode == "test":
         logger.info("Test Run")
-        multiverse_analysis.visit_universe(multiverse_grid[0])
-        if len(multiverse_grid) > 1:
-            multiverse_analysis.visit_universe(
-                multiverse_grid[len(multiverse_grid) - 1]
-            )
+        # Run the analysis for a small set of universes covering all options
+        multiverse_analysis.examine_multiverse(
+            multiverse_grid=generate_minimal_grid(multiverse_analysis.dimensions),
+            n_jobs=args.n_jobs,
+            backend=args.backend,
+        )
     elif args.mode == "continue":
         logger.info("Continuing Previous Run")
         missing_universes = multiverse_analysis.check_missing_universes()[
@@ -132,12 +181,20 @@ def run_cli(dimensions: Optional[dict] = None, **kwargs) -> None:
         ]
 
         # Run analysis only for missing universes
-        multiverse_analysis.examine_multiverse(multiverse_grid=missing_universes)
+        multiverse_analysis.examine_multiverse(
+            multiverse_grid=missing_universes,
+            n_jobs=args.n_jobs,
+            backend=args.backend,
+        )
     else:
         logger.info("Full Run")
         # Run analysis for all universes
-        multiverse_analysis.examine_multiverse(multiverse_grid=multiverse_grid)
+        multiverse_analysis.examine_multiverse(
+            multiverse_grid=multiverse_grid,
+            n_jobs=args.n_jobs,
+            backend=args.backend,
+        )
 
-    multiverse_analysis.aggregate_data(save=True)
+    multiverse_analysis.aggregate_data(save=True, output_format=args.output_format)
 
     multiverse_analysis.check_missing_universes()
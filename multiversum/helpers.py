@@ -1,6 +1,7 @@
+import json
+from pathlib import Path
 import pandas as pd
-from itertools import count
-from typing import Optional
+from typing import Any, Optional
 
 
 def add_universe_info_to_df(
@@ -20,13 +21,40 @@ def add_universe_info_to_df(
         dimensions: Dictionary with dimensions.
         execution_time: Execution time.
     """
-    index = count()
-    data.insert(next(index), "mv_universe_id", universe_id)
-    data.insert(next(index), "mv_run_no", run_no)
-    data.insert(next(index), "mv_execution_time", execution_time)
+    info = {
+        "mv_universe_id": universe_id,
+        "mv_run_no": run_no,
+        "mv_execution_time": execution_time,
+    }
 
     # Add info about dimensions
     dimensions_sorted = sorted(dimensions.keys())
     for dimension in dimensions_sorted:
-        data.insert(next(index), f"mv_dim_{dimension}", dimensions[dimension])
-    return data
+        info[f"mv_dim_{dimension}"] = dimensions[dimension]
+
+    existing_columns = [column for column in info if column in data.columns]
+    if existing_columns:
+        raise ValueError(f"Columns {existing_columns} already exist in data.")
+
+    # Build all info columns at once and prepend them in a single concat,
+    # instead of inserting them into data one by one
+    info_df = pd.DataFrame(
+        {column: [value] * len(data) for column, value in info.items()},
+        index=data.index,
+    )
+    return pd.concat([info_df, data], axis="columns")
+
+
+def save_json(data: Any, path: Path) -> None:
+    """
+    Save data as indented JSON to a file.
+
+    The data is serialized at once and written with a single call, instead
+    of json.dump issuing one write call per encoded chunk.
+
+    Args:
+        data: The data to save.
+        path: The path of the file to write.
+    """
+    with open(path, "w") as fp:
+        fp.write(json.dumps(data, indent=2))
@@ -3,8 +3,23 @@ This module contains helper functions to orchestrate a multiverse analysis.
 """
 
 import itertools
+import operator
+import os
+from contextlib import contextmanager
+from functools import reduce
 from pathlib import Path
-from typing import Any, Dict, List, Optional, TypedDict
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sized,
+    Tuple,
+    TypedDict,
+    Union,
+)
 from hashlib import md5
 import subprocess
 import json
@@ -12,10 +27,11 @@ import warnings
 import pandas as pd
 import papermill as pm
 from tqdm import tqdm
-from joblib import Parallel, delayed, cpu_count
-from .parallel import tqdm_joblib
+from joblib import Parallel, delayed, cpu_count, effective_n_jobs
+from joblib.parallel import BACKENDS, ParallelBackendBase
+from .IPCKernelManager import ReusableIPCKernelManager
 from .logger import logger
-from .helpers import add_universe_info_to_df
+from .helpers import add_universe_info_to_df, save_json
 
 import sys
 
@@ -24,19 +40,40 @@ if sys.version_info >= (3, 11):
 else:
     import tomli as tomllib
 
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, the counter is not locked there
+    fcntl = None
+
 DEFAULT_SEED = 80539
 ERRORS_DIR_NAME = "errors"
+KERNEL_BATCHES_PER_JOB = 4
+# Universes are executed in separate kernel processes, so workers mostly
+# wait on them and threads are sufficient
+DEFAULT_BACKEND = "threading"
 
 
-def generate_multiverse_grid(dimensions: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+def generate_multiverse_grid(
+    dimensions: Dict[str, List[str]],
+    lazy: bool = False,
+    max_size: Optional[int] = None,
+) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
     """
     Generate a full grid from a dictionary of dimensions.
 
     Args:
         dimensions: A dictionary containing Lists with options.
+        lazy: Whether to return an iterator generating the combinations on
+            demand instead of a list. Useful for very large grids, which
+            would otherwise have to be kept in memory. Defaults to False.
+        max_size: An optional maximum number of universes. If the grid would
+            be larger, a ValueError is raised before generating it.
+            Defaults to None (no limit).
 
     Returns:
-        A list of dicts containing all different combinations of the options.
+        A list of dicts containing all different combinations of the options
+            (or an iterator over them if lazy is True).
     """
     if not dimensions:
         raise ValueError("No (or empty) dimensions provided.")
@@ -45,9 +82,76 @@ def generate_multiverse_grid(dimensions: Dict[str, List[str]]) -> List[Dict[str,
     assert all(isinstance(k, str) for k in keys)
     assert all(isinstance(v, list) for v in values)
 
+    if max_size is not None:
+        size = reduce(operator.mul, (len(v) for v in values), 1)
+        if size > max_size:
+            raise ValueError(
+                f"Multiverse grid of size {size} exceeds max_size={max_size}."
+            )
+
     # from https://stackoverflow.com/questions/38721847/how-to-generate-all-combination-from-values-in-dict-of-lists-in-python
-    multiverse_grid = [dict(zip(keys, v)) for v in itertools.product(*values)]
-    return multiverse_grid
+    multiverse_grid = (dict(zip(keys, v)) for v in itertools.product(*values))
+    return multiverse_grid if lazy else list(multiverse_grid)
+
+
+def generate_minimal_grid(dimensions: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+    """
+    Generate a minimal grid from a dictionary of dimensions, in which each
+    option appears in at least one universe.
+
+    The grid is built by zipping the options of all dimensions, cycling
+    through shorter dimensions, without building the full grid.
+
+    Args:
+        dimensions: A dictionary containing Lists with options.
+
+    Returns:
+        A list of dicts, one per option of the largest dimension.
+    """
+    if not dimensions:
+        raise ValueError("No (or empty) dimensions provided.")
+
+    keys, values = zip(*dimensions.items())
+    assert all(isinstance(k, str) for k in keys)
+    assert all(isinstance(v, list) for v in values)
+
+    # Without options in a dimension, there are no universes (as in the full grid)
+    if not all(values):
+        return []
+
+    n_universes = max(len(v) for v in values)
+    return [
+        {k: v[i % len(v)] for k, v in zip(keys, values)} for i in range(n_universes)
+    ]
+
+
+def _compute_universe_id(universe_parameters: Dict[str, Any]) -> str:
+    # Note: Getting stable hashes seems to be easier said than done in Python
+    # See https://stackoverflow.com/questions/5884066/hashing-a-dictionary/22003440#22003440
+    return md5(
+        json.dumps(universe_parameters, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def _supports_return_generator(backend: Union[str, ParallelBackendBase, None]) -> bool:
+    """
+    Check whether a joblib backend can return results as they finish.
+
+    Args:
+        backend: The backend name, a backend instance or None for joblib's
+            default backend.
+
+    Returns:
+        False if the backend is known not to support returning generators.
+    """
+    if isinstance(backend, str):
+        if backend not in BACKENDS:
+            # Leave reporting invalid backends to joblib
+            return True
+        backend = BACKENDS[backend]()
+    if backend is None:
+        return True
+    return backend.supports_return_generator
 
 
 class MissingUniverseInfo(TypedDict):
@@ -70,6 +174,9 @@ class MultiverseAnalysis:
         seed: The seed to use for the analysis.
         stop_on_error: Whether to stop the analysis if an error occurs.
         cell_timeout: A timeout (in seconds) for each cell in the notebook.
+        reuse_kernels: Whether to reuse kernels across universes.
+        resume: Whether to skip universes that have already been completed.
+        max_size: The maximum number of universes in the multiverse grid.
     """
 
     dimensions = None
@@ -82,6 +189,9 @@ class MultiverseAnalysis:
     grid = None
     cell_timeout = None
     stop_on_error = True
+    reuse_kernels = False
+    resume = False
+    max_size = None
 
     def __init__(
         self,
@@ -94,6 +204,9 @@ class MultiverseAnalysis:
         seed: Optional[int] = DEFAULT_SEED,
         stop_on_error: bool = True,
         cell_timeout: Optional[int] = None,
+        reuse_kernels: bool = False,
+        resume: bool = False,
+        max_size: Optional[int] = None,
     ) -> None:
         """
         Initializes a new MultiverseAnalysis instance.
@@ -112,7 +225,25 @@ class MultiverseAnalysis:
             seed: The seed to use for the analysis.
             stop_on_error: Whether to stop the analysis if an error occurs.
             cell_timeout: A timeout (in seconds) for each cell in the notebook.
+            reuse_kernels: Whether to reuse kernels across universes instead of
+                starting a new kernel for every universe. This removes the
+                kernel startup time from all but the first universe of each
+                worker, but universes are no longer isolated from each other:
+                variables, imported modules and other state from previously
+                visited universes remain available in the kernel. Kernels are
+                restarted after a universe fails. Defaults to False.
+            resume: Whether to skip universes that have already been completed
+                in this run, i.e. whose data and output notebook both exist and
+                are newer than the notebook. Useful to resume a run after it
+                has been interrupted. Defaults to False.
+            max_size: An optional maximum number of universes. Generating a
+                larger multiverse grid raises a ValueError, before the grid is
+                built. Can also be set via the config. Defaults to None
+                (no limit).
         """
+        # Directories which have already been created by get_run_dir
+        self._made_dirs = set()
+
         if isinstance(config_file, Path):
             if config_file.suffix == ".toml":
                 with open(config_file, "rb") as fp:
@@ -130,9 +261,15 @@ class MultiverseAnalysis:
             if "stop_on_error" in config:
                 self.stop_on_error = config["stop_on_error"]
 
+            if "max_size" in config:
+                self.max_size = config["max_size"]
+
         if dimensions is not None:
             self.dimensions = dimensions
 
+        if max_size is not None:
+            self.max_size = max_size
+
         self.notebook = notebook
         self.output_dir = output_dir
         if self.output_dir is not None:
@@ -143,6 +280,8 @@ class MultiverseAnalysis:
         )
         self.stop_on_error = stop_on_error
         self.cell_timeout = cell_timeout
+        self.reuse_kernels = reuse_kernels
+        self.resume = resume
 
         if self.dimensions is None:
             raise ValueError(
@@ -161,7 +300,11 @@ class MultiverseAnalysis:
         """
         run_dir = self.output_dir / "runs" / str(self.run_no)
         target_dir = run_dir / sub_directory if sub_directory is not None else run_dir
-        target_dir.mkdir(parents=True, exist_ok=True)
+        # This is called multiple times per universe, so only create
+        # the directory once
+        if target_dir not in self._made_dirs:
+            target_dir.mkdir(parents=True, exist_ok=True)
+            self._made_dirs.add(target_dir)
         return target_dir
 
     def read_counter(self, increment: bool) -> int:
@@ -175,17 +318,22 @@ class MultiverseAnalysis:
             The current value of the counter.
         """
 
-        # Use a self-incrementing counter via counter.txt
+        # Use a self-incrementing counter via counter.txt, which is read and
+        # written while holding a lock, so concurrent analyses get unique runs
         counter_filepath = self.output_dir / "counter.txt"
-        if counter_filepath.is_file():
-            with open(counter_filepath, "r") as fp:
-                run_no = int(fp.read())
-        else:
-            run_no = 0
-        if increment:
-            run_no += 1
-        with open(counter_filepath, "w") as fp:
-            fp.write(str(run_no))
+        fd = os.open(counter_filepath, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            run_no = int(os.read(fd, 32).decode() or 0)
+            if increment:
+                run_no += 1
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, str(run_no).encode())
+        finally:
+            # Closing the file also releases the lock
+            os.close(fd)
 
         return run_no
 
@@ -199,14 +347,16 @@ class MultiverseAnalysis:
         Returns:
             A list of dicts containing the settings for different universes.
         """
-        self.grid = generate_multiverse_grid(self.dimensions)
+        self.grid = generate_multiverse_grid(self.dimensions, max_size=self.max_size)
         if save:
-            with open(self.output_dir / "multiverse_grid.json", "w") as fp:
-                json.dump(self.grid, fp, indent=2)
+            save_json(self.grid, self.output_dir / "multiverse_grid.json")
         return self.grid
 
     def aggregate_data(
-        self, include_errors: bool = True, save: bool = True
+        self,
+        include_errors: bool = True,
+        save: bool = True,
+        output_format: str = "csv",
     ) -> pd.DataFrame:
         """
         Aggregate the data from all universes into a single DataFrame.
@@ -214,16 +364,21 @@ class MultiverseAnalysis:
         Args:
             include_errors: Whether to include error information.
             save: Whether to save the aggregated data to a file.
+            output_format: The file format to save the aggregated data in.
+                Either "csv" (gzip compressed) or "parquet" (zstd compressed,
+                requires pyarrow). Defaults to "csv".
 
         Returns:
             A pandas DataFrame containing the aggregated data from all universes.
+                Non-numeric dimension columns (mv_dim_*) are stored as
+                categoricals.
         """
         data_dir = self.get_run_dir(sub_directory="data")
-        csv_files = list(data_dir.glob("*.csv"))
+        csv_files = self._list_csv_files(data_dir)
 
         if include_errors:
             error_dir = self.get_run_dir(sub_directory=ERRORS_DIR_NAME)
-            csv_files += list(error_dir.glob("*.csv"))
+            csv_files += self._list_csv_files(error_dir)
 
         if len(csv_files) == 0:
             logger.warning("No data files to aggregate, returning empty dataframe.")
@@ -231,11 +386,45 @@ class MultiverseAnalysis:
         else:
             df = pd.concat((pd.read_csv(f) for f in csv_files), ignore_index=True)
 
+        # Dimension columns only contain few distinct values, which are repeated
+        # for every row (and universe), storing them as categoricals saves
+        # memory and allows dictionary-encoding when saving as parquet.
+        # Numeric dimensions are kept as is, to still allow comparisons etc.
+        df = df.astype(
+            {
+                column: "category"
+                for column in df.columns
+                if column.startswith("mv_dim_")
+                and not pd.api.types.is_numeric_dtype(df[column])
+            }
+        )
+
         if save:
-            df.to_csv(data_dir / ("agg_" + str(self.run_no) + "_run_outputs.csv.gz"))
+            filename = "agg_" + str(self.run_no) + "_run_outputs"
+            if output_format == "csv":
+                df.to_csv(data_dir / (filename + ".csv.gz"))
+            elif output_format == "parquet":
+                df.to_parquet(
+                    data_dir / (filename + ".parquet"),
+                    engine="pyarrow",
+                    compression="zstd",
+                )
+            else:
+                raise ValueError("Only csv and parquet are supported as output_format.")
 
         return df
 
+    @staticmethod
+    def _list_csv_files(directory: Path) -> List[str]:
+        # Data directories can contain tens of thousands of files, so list them
+        # via scandir instead of creating and matching a Path for every file
+        with os.scandir(directory) as entries:
+            return [
+                entry.path
+                for entry in entries
+                if entry.name.endswith(".csv") and entry.is_file()
+            ]
+
     def check_missing_universes(self) -> MissingUniverseInfo:
         """
         Check if any universes from the multiverse have not yet been visited.
@@ -250,13 +439,18 @@ class MultiverseAnalysis:
             self.generate_universe_id(u_params): u_params
             for u_params in multiverse_grid
         }
-        all_universe_ids = set(multiverse_dict.keys())
+        all_universe_ids = pd.Index(list(multiverse_dict.keys()))
 
         aggregated_data = self.aggregate_data(include_errors=False, save=False)
-        universe_ids_with_data = set(aggregated_data["mv_universe_id"])
-
-        missing_universe_ids = all_universe_ids - universe_ids_with_data
-        extra_universe_ids = universe_ids_with_data - all_universe_ids
+        universe_ids_with_data = pd.Index(aggregated_data["mv_universe_id"]).unique()
+
+        # Keep universes in the order of the grid
+        missing_universe_ids = all_universe_ids.difference(
+            universe_ids_with_data, sort=False
+        ).tolist()
+        extra_universe_ids = universe_ids_with_data.difference(
+            all_universe_ids, sort=False
+        ).tolist()
         missing_universes = [multiverse_dict[u_id] for u_id in missing_universe_ids]
 
         if len(missing_universe_ids) > 0 or len(extra_universe_ids) > 0:
@@ -282,21 +476,27 @@ class MultiverseAnalysis:
         Returns:
             A unique ID for the universe.
         """
-        # Note: Getting stable hashes seems to be easier said than done in Python
-        # See https://stackoverflow.com/questions/5884066/hashing-a-dictionary/22003440#22003440
-        return md5(
-            json.dumps(universe_parameters, sort_keys=True).encode("utf-8")
-        ).hexdigest()
+        return _compute_universe_id(universe_parameters)
 
     def examine_multiverse(
-        self, multiverse_grid: List[Dict[str, Any]] = None, n_jobs: int = -2
+        self,
+        multiverse_grid: Optional[Iterable[Dict[str, Any]]] = None,
+        n_jobs: int = -2,
+        backend: Optional[str] = DEFAULT_BACKEND,
     ) -> None:
         """
         Run the analysis for all universes in the multiverse.
 
         Args:
             multiverse_grid: A list of dictionaries containing the settings for different universes.
+                Any other iterable (e.g. a lazily generated grid) is visited
+                without being materialized, unless reuse_kernels is set.
             n_jobs: The number of jobs to run in parallel. Defaults to -2 (all CPUs but one).
+            backend: The joblib backend to use for parallelization e.g. "loky",
+                "threading" or "multiprocessing". Any other backend registered
+                with joblib (e.g. "dask" or "ray") can be used as well.
+                Use None for joblib's default backend. Defaults to "threading",
+                as notebooks are executed in separate kernel processes anyway.
 
         Returns:
             None
@@ -304,26 +504,114 @@ class MultiverseAnalysis:
         if multiverse_grid is None:
             multiverse_grid = self.grid or self.generate_grid(save=False)
 
+        n_universes = (
+            len(multiverse_grid) if isinstance(multiverse_grid, Sized) else None
+        )
+
+        # Compute universe IDs only once here (and not again in every worker)
+        universes = ((self.generate_universe_id(u), u) for u in multiverse_grid)
+
         # Run analysis for all universes
         if n_jobs == 1:
             logger.info("Running in single-threaded mode (njobs = 1).")
-            for universe_params in tqdm(multiverse_grid, desc="Visiting Universes"):
-                self.visit_universe(universe_params)
+            with self._start_kernel() as kernel_manager:
+                for universe_id, universe_params in tqdm(
+                    universes, desc="Visiting Universes", total=n_universes
+                ):
+                    self.visit_universe(
+                        universe_params,
+                        kernel_manager=kernel_manager,
+                        universe_id=universe_id,
+                    )
         else:
             logger.info(
-                f"Running in parallel mode (njobs = {n_jobs}; {cpu_count()} CPUs detected)."
+                f"Running in parallel mode (njobs = {n_jobs}; {cpu_count()} CPUs detected; "
+                f"backend = {backend or 'default'})."
             )
-            with tqdm_joblib(
-                tqdm(desc="Visiting Universes", total=len(multiverse_grid), smoothing=0)
-            ) as progress_bar:  # noqa: F841
-                # For n_jobs below -1, (n_cpus + 1 + n_jobs) are used.
-                # Thus for n_jobs = -2, all CPUs but one are used
-                Parallel(n_jobs=n_jobs)(
-                    delayed(self.visit_universe)(universe_params)
-                    for universe_params in multiverse_grid
+            if self.reuse_kernels:
+                # Visit universes in batches, each sharing a single kernel.
+                # Use a few batches per job to still balance load across jobs.
+                universes = list(universes)
+                n_universes = len(universes)
+                n_batches = min(
+                    len(universes),
+                    effective_n_jobs(n_jobs) * KERNEL_BATCHES_PER_JOB,
                 )
+                batches = [universes[i::n_batches] for i in range(n_batches)]
+            else:
+                # Universes are only generated when they are dispatched
+                batches = ([universe] for universe in universes)
+
+            # For n_jobs below -1, (n_cpus + 1 + n_jobs) are used.
+            # Thus for n_jobs = -2, all CPUs but one are used
+            # Some backends (e.g. multiprocessing) can't return results
+            # as they finish, so they are only returned at the end
+            return_as = (
+                "generator_unordered" if _supports_return_generator(backend) else "list"
+            )
+            parallel = Parallel(n_jobs=n_jobs, backend=backend, return_as=return_as)
+            results = parallel(
+                delayed(self._visit_universe_batch)(batch) for batch in batches
+            )
+            # Results are returned as soon as any batch finishes (if supported)
+            with tqdm(
+                desc="Visiting Universes", total=n_universes, smoothing=0
+            ) as progress_bar:
+                for n_visited in results:
+                    progress_bar.update(n_visited)
+
+    @contextmanager
+    def _start_kernel(self) -> Iterator[Optional[ReusableIPCKernelManager]]:
+        """
+        Start a kernel to be reused across universes (if reuse_kernels is set).
+
+        Yields:
+            The kernel manager or None, if kernels are not to be reused.
+        """
+        if not self.reuse_kernels:
+            yield None
+            return
+
+        kernelspec = pm.iorw.load_notebook_node(str(self.notebook)).metadata.get(
+            "kernelspec", {}
+        )
+        kernel_kwargs = (
+            {"kernel_name": kernelspec["name"]} if "name" in kernelspec else {}
+        )
+        kernel_manager = ReusableIPCKernelManager(**kernel_kwargs)
+        kernel_manager.start_blocking()
+        try:
+            yield kernel_manager
+        finally:
+            kernel_manager.shutdown_blocking()
+
+    def _visit_universe_batch(self, universes: List[Tuple[str, Dict[str, str]]]) -> int:
+        """
+        Run the analysis for a batch of universes, using a single kernel
+        (if reuse_kernels is set).
 
-    def visit_universe(self, universe_dimensions: Dict[str, str]) -> None:
+        Args:
+            universes: A list of tuples of universe IDs and dictionaries
+                containing the parameters for the universes.
+
+        Returns:
+            The number of visited universes.
+        """
+        with self._start_kernel() as kernel_manager:
+            for universe_id, universe_params in universes:
+                self.visit_universe(
+                    universe_params,
+                    kernel_manager=kernel_manager,
+                    universe_id=universe_id,
+                )
+        return len(universes)
+
+    def visit_universe(
+        self,
+        universe_dimensions: Dict[str, str],
+        kernel_manager: Optional[ReusableIPCKernelManager] = None,
+        universe_id: Optional[str] = None,
+    ) -> None:
         """
         Run the complete analysis for a single universe.
 
@@ -333,25 +621,34 @@ class MultiverseAnalysis:
         Args:
             universe_dimensions: A dictionary containing the parameters
                 for the universe.
+            kernel_manager: An optional kernel manager with an already running
+                kernel to execute the notebook in. Defaults to None (start a
+                new kernel).
+            universe_id: The ID of the universe, if it has already been
+                generated. Defaults to None (generate it here).
 
         Returns:
             None
         """
         # Generate universe ID
-        universe_id = self.generate_universe_id(universe_dimensions)
+        if universe_id is None:
+            universe_id = self.generate_universe_id(universe_dimensions)
         logger.debug(f"Visiting universe: {universe_id}")
 
-        # Clean up any old error fiels
-        error_path = self._get_error_filepath(universe_id)
-        if error_path.is_file():
-            error_path.remove()
-
         # Generate final command
         output_dir = self.get_run_dir(sub_directory="notebooks")
         output_filename = "m_" + str(self.run_no) + "-" + universe_id + ".ipynb"
 
-        # Ensure output dir exists
-        output_dir.mkdir(parents=True, exist_ok=True)
+        if self.resume and self._is_universe_complete(
+            universe_id, output_dir / output_filename
+        ):
+            logger.debug(f"Skipping already completed universe: {universe_id}")
+            return
+
+        # Clean up any old error fiels
+        error_path = self._get_error_filepath(universe_id)
+        if error_path.is_file():
+            error_path.unlink()
 
         # Prepare settings dictionary
         settings = {
@@ -370,6 +667,7 @@ class MultiverseAnalysis:
                 parameters={
                     "settings": settings_str,
                 },
+                kernel_manager=kernel_manager,
             )
         except Exception as e:
             logger.error(f"Error in universe {universe_id} ({output_filename})")
@@ -379,6 +677,33 @@ class MultiverseAnalysis:
                 logger.exception(e)
                 self.save_error(universe_id, universe_dimensions, e)
 
+    def _is_universe_complete(self, universe_id: str, notebook_path: Path) -> bool:
+        """
+        Check whether a universe has already been completed in this run, i.e.
+        whether both its data and its output notebook exist and the output
+        notebook is not older than the universe notebook.
+
+        Args:
+            universe_id: The ID of the universe.
+            notebook_path: The path of the universe's output notebook.
+
+        Returns:
+            Whether the universe has already been completed.
+        """
+        data_path = self._get_data_filepath(universe_id)
+        return (
+            data_path.is_file()
+            and notebook_path.is_file()
+            and notebook_path.stat().st_mtime >= Path(self.notebook).stat().st_mtime
+        )
+
+    def _get_data_filepath(self, universe_id: str) -> Path:
+        # Note: This has to match the path used in Universe.save_data
+        data_dir = self.get_run_dir(sub_directory="data")
+        data_filename = "d_" + str(self.run_no) + "_" + universe_id + ".csv"
+
+        return data_dir / data_filename
+
     def _get_error_filepath(self, universe_id: str) -> Path:
         error_dir = self.get_run_dir(sub_directory=ERRORS_DIR_NAME)
         error_filename = "e_" + str(self.run_no) + "-" + universe_id + ".csv"
@@ -443,13 +768,24 @@ class MultiverseAnalysis:
             call_params.append(value)
 
         logger.info(" ".join(call_params))
-        # Call papermill render
-        process = subprocess.run(call_params, capture_output=True, text=True)
-        logger.info(process.stdout)
-        logger.info(process.stderr)
+        # Call papermill render, streaming its output instead of buffering
+        # all of it until the process exits
+        with subprocess.Popen(
+            call_params,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+        ) as process:
+            for line in process.stdout:
+                logger.info(line.rstrip("\n"))
 
     def execute_notebook_via_api(
-        self, input_path: str, output_path: str, parameters: Dict[str, str]
+        self,
+        input_path: str,
+        output_path: str,
+        parameters: Dict[str, str],
+        kernel_manager: Optional[ReusableIPCKernelManager] = None,
     ):
         """
         Executes a notebook via the papermill python API.
@@ -458,15 +794,37 @@ class MultiverseAnalysis:
             input_path: The path to the input notebook.
             output_path: The path to the output notebook.
             parameters: A dictionary containing the parameters for the notebook.
+            kernel_manager: An optional kernel manager with an already running
+                kernel to execute the notebook in. Defaults to None (start a
+                new kernel).
 
         Returns:
             None
         """
-        pm.execute_notebook(
-            input_path,
-            output_path,
-            parameters=parameters,
-            progress_bar=False,
-            kernel_manager_class="multiversum.IPCKernelManager.IPCKernelManager",
-            execution_timeout=self.cell_timeout,
-        )
+        if kernel_manager is None:
+            pm.execute_notebook(
+                input_path,
+                output_path,
+                parameters=parameters,
+                progress_bar=False,
+                kernel_manager_class="multiversum.IPCKernelManager.IPCKernelManager",
+                execution_timeout=self.cell_timeout,
+            )
+            return
+
+        try:
+            pm.execute_notebook(
+                input_path,
+                output_path,
+                parameters=parameters,
+                progress_bar=False,
+                execution_timeout=self.cell_timeout,
+                km=kernel_manager,
+            )
+        except Exception:
+            # The kernel may still be busy (e.g. after a timeout) or be left in
+            # a broken state, so start from a fresh one for the next universe
+            kernel_manager.restart_blocking()
+            raise
+        finally:
+            kernel_manager.stop_clients()
@@ -1,9 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import md5
+import json
 import logging
+import numpy as np
 import pandas as pd
 from pandas.testing import assert_series_equal
 
 import pytest
-from multiversum import generate_multiverse_grid, MultiverseAnalysis, Universe
+from multiversum import (
+    generate_multiverse_grid,
+    generate_minimal_grid,
+    MultiverseAnalysis,
+    Universe,
+)
+from multiversum import helpers
+from multiversum.helpers import add_universe_info_to_df
 
 from pathlib import Path
 import shutil
@@ -37,6 +48,23 @@ class TestGenerateMultiverseGrid:
             {"x": 2, "y": 4},
         ]
 
+    def test_grid_lazy(self):
+        dimensions = {"x": [1, 2], "y": [3, 4]}
+        grid = generate_multiverse_grid(dimensions, lazy=True)
+        assert not isinstance(grid, list)
+        assert list(grid) == generate_multiverse_grid(dimensions)
+
+    def test_max_size(self):
+        dimensions = {"x": [1, 2], "y": [3, 4]}
+        assert len(generate_multiverse_grid(dimensions, max_size=4)) == 4
+        with pytest.raises(ValueError, match="size 4 exceeds max_size=3"):
+            generate_multiverse_grid(dimensions, max_size=3)
+        # The size is checked without generating the grid
+        with pytest.raises(ValueError):
+            generate_multiverse_grid(
+                {str(i): list(range(100)) for i in range(10)}, max_size=10**6
+            )
+
     def test_edge_cases(self):
         # Test with empty dimensions
         with pytest.raises(ValueError):
@@ -58,6 +86,22 @@ class TestGenerateMultiverseGrid:
         ]
 
 
+class TestGenerateMinimalGrid:
+    def test_grid(self):
+        assert generate_minimal_grid({"x": [1, 2, 3], "y": [4, 5], "z": [6]}) == [
+            {"x": 1, "y": 4, "z": 6},
+            {"x": 2, "y": 5, "z": 6},
+            {"x": 3, "y": 4, "z": 6},
+        ]
+
+    def test_edge_cases(self):
+        with pytest.raises(ValueError):
+            generate_minimal_grid({})
+        with pytest.raises(AssertionError):
+            generate_minimal_grid({"x": "hello"})
+        assert generate_minimal_grid({"x": [1, 2], "y": []}) == []
+
+
 class TestMultiverseAnalysis:
     def test_config_json(self):
         mv = MultiverseAnalysis(
@@ -98,6 +142,7 @@ class TestMultiverseAnalysis:
         aggregated_data = mv.aggregate_data(save=False)
         assert not aggregated_data.empty
         assert "value" in aggregated_data.columns
+        assert isinstance(aggregated_data["mv_dim_x"].dtype, pd.CategoricalDtype)
 
         # Check whether missing universes remain
         missing_info = mv.check_missing_universes()
@@ -144,6 +189,93 @@ class TestMultiverseAnalysis:
             pd.Series([None, None, "ValueError", "ValueError"], name="mv_error_type"),
         )
 
+    @pytest.mark.parametrize("n_jobs", [1, 2])
+    def test_noteboook_simple_reuse_kernels(self, n_jobs):
+        output_dir = get_temp_dir(
+            f"test_MultiverseAnalysis_noteboook_simple_reuse_kernels_{n_jobs}"
+        )
+        mv = MultiverseAnalysis(
+            {
+                "x": ["A", "B"],
+                "y": ["A", "B", "C"],
+            },
+            notebook=TEST_DIR / "notebooks" / "simple.ipynb",
+            output_dir=output_dir,
+            reuse_kernels=True,
+        )
+        mv.examine_multiverse(n_jobs=n_jobs)
+
+        assert count_files(output_dir, "runs/1/data/*.csv") == 6
+        assert count_files(output_dir, "runs/1/notebooks/*.ipynb") == 6
+        missing_info = mv.check_missing_universes()
+        assert len(missing_info["missing_universe_ids"]) == 0
+
+    def test_noteboook_simple_lazy_grid(self):
+        output_dir = get_temp_dir("test_MultiverseAnalysis_noteboook_simple_lazy_grid")
+        dimensions = {
+            "x": ["A", "B"],
+            "y": ["A", "B"],
+        }
+        mv = MultiverseAnalysis(
+            dimensions,
+            notebook=TEST_DIR / "notebooks" / "simple.ipynb",
+            output_dir=output_dir,
+        )
+        mv.examine_multiverse(generate_multiverse_grid(dimensions, lazy=True))
+
+        assert count_files(output_dir, "runs/1/data/*.csv") == 4
+        missing_info = mv.check_missing_universes()
+        assert len(missing_info["missing_universe_ids"]) == 0
+
+    def test_noteboook_simple_modified_grid(self):
+        output_dir = get_temp_dir(
+            "test_MultiverseAnalysis_noteboook_simple_modified_grid"
+        )
+        mv = MultiverseAnalysis(
+            {
+                "x": ["A", "B", "C"],
+                "y": ["A"],
+            },
+            notebook=TEST_DIR / "notebooks" / "simple.ipynb",
+            output_dir=output_dir,
+        )
+        grid = mv.generate_grid(save=False)
+        grid.reverse()
+        mv.examine_multiverse(grid)
+        mv.grid = [u for u in mv.grid if u["x"] != "A"]
+        mv.examine_multiverse()
+
+        # Universes need to be saved under their own IDs
+        aggregated_data = mv.aggregate_data(save=False)
+        assert aggregated_data.shape[0] == 3
+        for _, row in aggregated_data.iterrows():
+            assert row["mv_universe_id"] == mv.generate_universe_id(
+                {"x": row["mv_dim_x"], "y": row["mv_dim_y"]}
+            )
+
+    def test_noteboook_timeout_reuse_kernels(self):
+        output_dir = get_temp_dir("test_MultiverseAnalysis_noteboook_timeout_reuse")
+        mv = MultiverseAnalysis(
+            {
+                "x": ["A", "B"],
+                "y": ["A"],
+            },
+            notebook=TEST_DIR / "notebooks" / "slow.ipynb",
+            output_dir=output_dir,
+            cell_timeout=1,
+            stop_on_error=False,
+            reuse_kernels=True,
+        )
+        mv.examine_multiverse(n_jobs=1)
+
+        # The kernel is restarted after the first timeout, so the second
+        # universe has to time out on its own as well
+        aggregated_data = mv.aggregate_data(save=False)
+        assert aggregated_data["mv_error_type"].tolist() == [
+            "CellTimeoutError",
+            "CellTimeoutError",
+        ]
+
     def test_noteboook_timeout(self):
         output_dir = get_temp_dir("test_MultiverseAnalysis_noteboook_timeout")
         mv = MultiverseAnalysis(
@@ -206,6 +338,23 @@ class TestMultiverseAnalysis:
             {"x": "A", "y": "B"}
         ) == MultiverseAnalysis.generate_universe_id({"y": "B", "x": "A"})
 
+    def test_generate_universe_id_unhashable(self):
+        universe_id = MultiverseAnalysis.generate_universe_id({"x": ["A", "B"]})
+        assert universe_id == MultiverseAnalysis.generate_universe_id({"x": ["A", "B"]})
+        assert universe_id != MultiverseAnalysis.generate_universe_id({"x": "A"})
+
+    def test_generate_universe_id_types(self):
+        assert MultiverseAnalysis.generate_universe_id(
+            {"x": 1}
+        ) != MultiverseAnalysis.generate_universe_id({"x": True})
+
+    @pytest.mark.parametrize("first,second", [((1,), (True,)), (0.0, -0.0)])
+    def test_generate_universe_id_equal_values(self, first, second):
+        # Values comparing equal but serialized differently get different IDs
+        for value in [first, second]:
+            expected_id = md5(json.dumps({"x": value}).encode("utf-8")).hexdigest()
+            assert MultiverseAnalysis.generate_universe_id({"x": value}) == expected_id
+
     def test_visit_universe(self):
         output_dir = get_temp_dir("test_MultiverseAnalysis_visit_universe")
         mv = MultiverseAnalysis(
@@ -219,6 +368,171 @@ class TestMultiverseAnalysis:
         mv.visit_universe({"x": "A", "y": "B"})
         assert count_files(output_dir, "runs/1/notebooks/*.ipynb") == 1
 
+    def test_generate_grid_save(self):
+        output_dir = get_temp_dir("test_MultiverseAnalysis_generate_grid_save")
+        mv = MultiverseAnalysis(
+            dimensions={"x": ["A", "B"], "y": [1, 2]},
+            output_dir=output_dir,
+        )
+        grid = mv.generate_grid(save=True)
+        with open(output_dir / "multiverse_grid.json", "r") as fp:
+            assert json.load(fp) == grid
+
+    def test_read_counter_concurrent(self):
+        output_dir = get_temp_dir("test_MultiverseAnalysis_read_counter_concurrent")
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            run_nos = list(
+                executor.map(
+                    lambda _: (
+                        MultiverseAnalysis({"x": [1]}, output_dir=output_dir).run_no
+                    ),
+                    range(16),
+                )
+            )
+        assert sorted(run_nos) == list(range(1, 17))
+        assert (output_dir / "counter.txt").read_text() == "16"
+
+    def test_generate_grid_max_size(self):
+        mv = MultiverseAnalysis(
+            dimensions={"x": ["A", "B"], "y": [1, 2]},
+            output_dir=get_temp_dir("test_MultiverseAnalysis_generate_grid_max_size"),
+            max_size=3,
+        )
+        with pytest.raises(ValueError, match="exceeds max_size=3"):
+            mv.examine_multiverse()
+        with pytest.raises(ValueError, match="exceeds max_size=3"):
+            mv.check_missing_universes()
+
+    def test_config_max_size(self):
+        output_dir = get_temp_dir("test_MultiverseAnalysis_config_max_size")
+        config_file = output_dir / "config.json"
+        config_file.write_text(
+            json.dumps({"dimensions": {"x": ["A", "B"], "y": [1, 2]}, "max_size": 3})
+        )
+        mv = MultiverseAnalysis(config_file=config_file, output_dir=output_dir)
+        assert mv.max_size == 3
+        with pytest.raises(ValueError, match="exceeds max_size=3"):
+            mv.generate_grid()
+
+    def test_config_json_non_finite(self):
+        output_dir = get_temp_dir("test_MultiverseAnalysis_config_json_non_finite")
+        config_file = output_dir / "config.json"
+        config_file.write_text(
+            '{"dimensions": {"x": [NaN, Infinity, 1], "y": [1180591620717411303424]}}'
+        )
+        mv = MultiverseAnalysis(config_file=config_file, output_dir=output_dir)
+        assert np.isnan(mv.dimensions["x"][0])
+        assert mv.dimensions["x"][1:] == [float("inf"), 1]
+        assert mv.dimensions["y"] == [2**70]
+
+    def test_check_missing_universes_no_data(self):
+        mv = MultiverseAnalysis(
+            dimensions={"x": ["A", "B"], "y": [1, 2]},
+            output_dir=get_temp_dir("test_MultiverseAnalysis_check_missing_no_data"),
+        )
+        with pytest.warns(UserWarning, match="Found missing 4"):
+            missing_info = mv.check_missing_universes()
+        assert missing_info["missing_universe_ids"] == [
+            mv.generate_universe_id(u) for u in mv.grid
+        ]
+        assert missing_info["extra_universe_ids"] == []
+        assert missing_info["missing_universes"] == mv.grid
+
+    def test_visit_universe_numeric_settings(self, monkeypatch):
+        mv = MultiverseAnalysis(
+            dimensions={"x": [np.float64(0.5), float("nan")], "y": [2**70]},
+            output_dir=get_temp_dir("test_MultiverseAnalysis_numeric_settings"),
+        )
+        settings_strs = []
+        monkeypatch.setattr(
+            mv,
+            "execute_notebook_via_api",
+            lambda parameters, **kwargs: settings_strs.append(parameters["settings"]),
+        )
+        for universe in mv.generate_grid(save=False):
+            mv.visit_universe(universe)
+
+        dimensions = [json.loads(s)["dimensions"] for s in settings_strs]
+        assert dimensions[0] == {"x": 0.5, "y": 2**70}
+        assert np.isnan(dimensions[1]["x"])
+
+    def test_examine_multiverse_invalid_backend(self):
+        mv = MultiverseAnalysis(
+            dimensions={"x": ["A", "B"]},
+            output_dir=get_temp_dir("test_MultiverseAnalysis_invalid_backend"),
+        )
+        with pytest.raises(ValueError, match="Invalid backend"):
+            mv.examine_multiverse(n_jobs=2, backend="not-a-backend")
+
+    def test_visit_universe_resume(self):
+        output_dir = get_temp_dir("test_MultiverseAnalysis_visit_universe_resume")
+        mv = MultiverseAnalysis(
+            {
+                "x": ["A", "B"],
+                "y": ["A", "B"],
+            },
+            notebook=TEST_DIR / "notebooks" / "simple.ipynb",
+            output_dir=output_dir,
+            resume=True,
+        )
+        mv.visit_universe({"x": "A", "y": "B"})
+        notebook_path = next(output_dir.glob("runs/1/notebooks/*.ipynb"))
+        mtime = notebook_path.stat().st_mtime
+
+        # Completed universes are skipped
+        mv.visit_universe({"x": "A", "y": "B"})
+        assert notebook_path.stat().st_mtime == mtime
+
+        # Universes without data are visited again
+        next(output_dir.glob("runs/1/data/*.csv")).unlink()
+        mv.visit_universe({"x": "A", "y": "B"})
+        assert notebook_path.stat().st_mtime > mtime
+        assert count_files(output_dir, "runs/1/data/*.csv") == 1
+
+    def test_aggregate_data_dimension_dtypes(self):
+        mv = MultiverseAnalysis(
+            dimensions={"x": ["A", "B"], "k": [1, 2]},
+            output_dir=get_temp_dir("test_MultiverseAnalysis_aggregate_data_dtypes"),
+        )
+        for universe in mv.generate_grid(save=False):
+            universe_id = mv.generate_universe_id(universe)
+            add_universe_info_to_df(
+                pd.DataFrame({"value": [1.0]}),
+                universe_id=universe_id,
+                run_no=mv.run_no,
+                dimensions=universe,
+            ).to_csv(mv._get_data_filepath(universe_id), index=False)
+
+        aggregated_data = mv.aggregate_data(save=False)
+        assert isinstance(aggregated_data["mv_dim_x"].dtype, pd.CategoricalDtype)
+        assert pd.api.types.is_integer_dtype(aggregated_data["mv_dim_k"])
+        assert (aggregated_data["mv_dim_k"] > 1).sum() == 2
+
+    def test_aggregate_data_parquet(self):
+        pytest.importorskip("pyarrow")
+        output_dir = get_temp_dir("test_MultiverseAnalysis_aggregate_data_parquet")
+        mv = MultiverseAnalysis(
+            dimensions={"x": ["A", "B"]},
+            output_dir=output_dir,
+        )
+        mv.save_error("test_universe", {"x": "A"}, Exception("Test exception"))
+        mv.aggregate_data(save=True, output_format="parquet")
+
+        agg_file = output_dir / "runs/1/data/agg_1_run_outputs.parquet"
+        assert agg_file.is_file()
+        agg_data = pd.read_parquet(agg_file)
+        assert isinstance(agg_data["mv_dim_x"].dtype, pd.CategoricalDtype)
+        assert agg_data["mv_universe_id"].iloc[0] == "test_universe"
+
+    def test_aggregate_data_invalid_format(self):
+        output_dir = get_temp_dir("test_MultiverseAnalysis_aggregate_data_invalid")
+        mv = MultiverseAnalysis(
+            dimensions={"x": ["A", "B"]},
+            output_dir=output_dir,
+        )
+        with pytest.raises(ValueError):
+            mv.aggregate_data(save=True, output_format="xlsx")
+
 
 class TestUniverse:
     def test_add_universe_info(self):
@@ -291,6 +605,18 @@ class TestUniverse:
         assert error_data["mv_error"].iloc[0] == "Test exception"
 
 
+class TestJsonHelpers:
+    def test_save_load_json(self):
+        path = get_temp_dir("test_JsonHelpers_save_load") / "a.json"
+        data = [{"x": "Ä", "y": 1.5, "z": None}, {"x": np.float64(0.5), "y": np.nan}]
+        helpers.save_json(data, path)
+        loaded = json.loads(path.read_text())
+        assert loaded[0] == data[0]
+        assert loaded[1]["x"] == 0.5
+        assert np.isnan(loaded[1]["y"])
+        assert "NaN" in path.read_text()
+
+
 class TestCLI:
     def test_simple(self):
         output_dir = get_temp_dir("test_CLI_simple")
@@ -309,6 +635,22 @@ class TestCLI:
         assert count_files(output_dir, "counter.txt") == 1
         assert count_files(output_dir, "multiverse_grid.json") == 1
 
+    @pytest.mark.parametrize("backend", ["loky", "threading", "multiprocessing"])
+    def test_backend(self, backend):
+        output_dir = get_temp_dir(f"test_CLI_backend_{backend}")
+        notebook = TEST_DIR / "notebooks" / "simple.ipynb"
+        config = TEST_DIR / "notebooks" / "simple_a.json"
+
+        # Run a test multiverse analysis via the CLI
+        exit_code = os.system(
+            f"python -m multiversum --notebook {notebook} --config {config} --output-dir {output_dir} "
+            f"--mode test --n-jobs 2 --backend {backend}"
+        )
+
+        assert exit_code == 0
+        assert count_files(output_dir, "runs/1/data/*.csv") == 2
+        assert count_files(output_dir, "runs/1/notebooks/*.ipynb") == 2
+
     def test_multiverse_py_empty(self):
         output_dir = get_temp_dir("test_multiverse_py_empty")
         notebook = TEST_DIR / "notebooks" / "simple.ipynb"